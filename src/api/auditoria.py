@@ -0,0 +1,215 @@
+# src/api/auditoria.py
+import atexit
+import gzip
+import json
+import os
+import queue
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from threading import Event, Lock, Thread
+from typing import Dict, Any, List, Optional
+
+# Configuración (sobrescribible por variables de entorno)
+AUDIT_DIR = Path(os.environ.get("AUDIT_LOG_DIR", "data/logs"))
+AUDIT_ENABLED = os.environ.get("AUDIT_LOG_ENABLED", "1") != "0"
+AUDIT_COMPRESS = os.environ.get("AUDIT_LOG_COMPRESS", "0") == "1"
+AUDIT_MAX_MB = float(os.environ.get("AUDIT_LOG_MAX_MB", "50"))
+AUDIT_ROTATE_S = float(os.environ.get("AUDIT_LOG_ROTATE_S", "3600"))
+
+
+class RegistroAuditoria:
+    """
+    Log de peticiones asíncrono: los handlers encolan entradas sin bloquear y un
+    hilo de fondo las escribe por lotes en archivos JSONL rotativos (opcionalmente gzip).
+    Si la cola está llena la entrada se descarta y se cuenta; nunca se frena el servicio.
+    Un error al escribir (disco lleno, permisos, entrada no serializable) se cuenta
+    en 'errores' y el hilo sigue vivo: el siguiente lote abre un archivo nuevo.
+    """
+
+    def __init__(
+        self,
+        directorio: Path = AUDIT_DIR,
+        max_cola: int = 10_000,
+        tam_lote: int = 256,
+        intervalo_s: float = 1.0,
+        max_bytes: int = int(AUDIT_MAX_MB * 1024 * 1024),
+        rotar_cada_s: float = AUDIT_ROTATE_S,
+        comprimir: bool = AUDIT_COMPRESS,
+    ):
+        self.directorio = Path(directorio)
+        self.tam_lote = tam_lote
+        self.intervalo_s = intervalo_s
+        self.max_bytes = max_bytes
+        self.rotar_cada_s = rotar_cada_s
+        self.comprimir = comprimir
+
+        self._cola: "queue.Queue[Dict[str, Any]]" = queue.Queue(maxsize=max_cola)
+        self._parar = Event()
+        self._hilo: Optional[Thread] = None
+        self._lock = Lock()
+        self._fh = None
+        self._archivo: Optional[Path] = None
+        self._bytes = 0
+        self._abierto_en = 0.0
+
+        self.encoladas = 0
+        self.descartadas = 0
+        self.escritas = 0
+        self.errores = 0
+        self.ultimo_error: Optional[str] = None
+
+    # ---------- API para los handlers ----------
+
+    def registrar(self, entrada: Dict[str, Any]) -> bool:
+        """Encola una entrada; devuelve False si se descartó por cola llena."""
+        try:
+            self._cola.put_nowait(entrada)
+        except queue.Full:
+            with self._lock:
+                self.descartadas += 1
+            return False
+        with self._lock:
+            self.encoladas += 1
+        return True
+
+    def estado(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "encoladas": self.encoladas,
+                "escritas": self.escritas,
+                "descartadas": self.descartadas,
+                "errores": self.errores,
+                "ultimo_error": self.ultimo_error,
+                "pendientes": self._cola.qsize(),
+                "writer_vivo": self._hilo is not None and self._hilo.is_alive(),
+                "archivo_actual": str(self._archivo) if self._archivo else None,
+            }
+
+    # ---------- Ciclo de vida ----------
+
+    def iniciar(self) -> "RegistroAuditoria":
+        if self._hilo is None:
+            self.directorio.mkdir(parents=True, exist_ok=True)
+            self._hilo = Thread(target=self._bucle, name="auditoria-writer", daemon=True)
+            self._hilo.start()
+        return self
+
+    def cerrar(self, timeout: float = 5.0) -> None:
+        """
+        Detiene el hilo escritor tras vaciar la cola y cierra el archivo actual.
+        Si el hilo no termina dentro del timeout el archivo queda en sus manos.
+        """
+        self._parar.set()
+        if self._hilo is not None:
+            self._hilo.join(timeout)
+            if self._hilo.is_alive():
+                return
+            self._hilo = None
+        self._cerrar_archivo()
+
+    # ---------- Hilo escritor ----------
+
+    def _tomar_lote(self) -> List[Dict[str, Any]]:
+        try:
+            lote = [self._cola.get(timeout=self.intervalo_s)]
+        except queue.Empty:
+            return []
+        while len(lote) < self.tam_lote:
+            try:
+                lote.append(self._cola.get_nowait())
+            except queue.Empty:
+                break
+        return lote
+
+    def _bucle(self) -> None:
+        while not (self._parar.is_set() and self._cola.empty()):
+            lote = self._tomar_lote()
+            if lote:
+                self._escribir(lote)
+            elif self._fh is not None and time.time() - self._abierto_en >= self.rotar_cada_s:
+                self._descartar_archivo()
+
+    def _registrar_error(self, error: Exception, n: int) -> None:
+        with self._lock:
+            self.errores += n
+            self.ultimo_error = f"{type(error).__name__}: {error}"
+
+    def _serializar(self, lote: List[Dict[str, Any]]) -> bytes:
+        lineas = []
+        for entrada in lote:
+            try:
+                lineas.append(json.dumps(entrada, ensure_ascii=False, default=str) + "\n")
+            except Exception as e:
+                self._registrar_error(e, 1)
+        return "".join(lineas).encode("utf-8")
+
+    def _escribir(self, lote: List[Dict[str, Any]]) -> None:
+        datos = self._serializar(lote)
+        n = datos.count(b"\n")
+        if not n:
+            return
+        try:
+            if self._fh is None or self._debe_rotar():
+                self._rotar()
+            self._fh.write(datos)
+            self._fh.flush()
+        except Exception as e:
+            # El lote se pierde; se descarta el archivo para reabrir en el siguiente
+            self._registrar_error(e, n)
+            self._descartar_archivo()
+            return
+        self._bytes += len(datos)
+        with self._lock:
+            self.escritas += n
+
+    def _debe_rotar(self) -> bool:
+        # El límite de tamaño se mide en bytes sin comprimir
+        return self._bytes >= self.max_bytes or time.time() - self._abierto_en >= self.rotar_cada_s
+
+    def _rotar(self) -> None:
+        self._cerrar_archivo()
+        sello = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%fZ")
+        nombre = f"requests-{sello}.jsonl" + (".gz" if self.comprimir else "")
+        self._archivo = self.directorio / nombre
+        self._fh = gzip.open(self._archivo, "ab") if self.comprimir else open(self._archivo, "ab")
+        self._bytes = 0
+        self._abierto_en = time.time()
+
+    def _cerrar_archivo(self) -> None:
+        fh, self._fh = self._fh, None
+        if fh is not None:
+            fh.close()
+
+    def _descartar_archivo(self) -> None:
+        """Cierra el archivo desde el hilo escritor sin dejar que un error lo mate."""
+        try:
+            self._cerrar_archivo()
+        except Exception as e:
+            self._registrar_error(e, 0)
+
+
+# Registro global de la API (se crea al primer uso)
+_REGISTRO: Optional[RegistroAuditoria] = None
+_REGISTRO_LOCK = Lock()
+
+
+def obtener_registro() -> Optional[RegistroAuditoria]:
+    """Devuelve el registro de auditoría de la API, o None si está deshabilitado."""
+    global _REGISTRO
+    if not AUDIT_ENABLED:
+        return None
+    if _REGISTRO is None:
+        with _REGISTRO_LOCK:
+            if _REGISTRO is None:
+                _REGISTRO = RegistroAuditoria().iniciar()
+                atexit.register(_REGISTRO.cerrar)
+    return _REGISTRO
+
+
+def leer_registros(ruta: Path) -> List[Dict[str, Any]]:
+    """Lee un archivo de auditoría (JSONL o JSONL.gz) para reproducir las peticiones."""
+    ruta = Path(ruta)
+    abrir = gzip.open if ruta.suffix == ".gz" else open
+    with abrir(ruta, "rt", encoding="utf-8") as fh:
+        return [json.loads(linea) for linea in fh if linea.strip()]
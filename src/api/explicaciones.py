@@ -0,0 +1,98 @@
+# src/api/explicaciones.py
+from typing import Dict, Any, Optional, Tuple
+import numpy as np
+from scipy import sparse
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.tree import DecisionTreeRegressor
+
+
+def _explicador_lineal(modelo, X_fondo) -> Optional[Dict[str, Any]]:
+    """
+    Pliega el StandardScaler en los coeficientes: pred = intercepto + X @ pesos.
+    La contribución de cada feature es pesos * (x - media_fondo).
+    """
+    pasos = [p for _, p in modelo.steps] if isinstance(modelo, Pipeline) else [modelo]
+    previos, final = pasos[:-1], pasos[-1]
+    if not hasattr(final, "coef_") or len(previos) > 1:
+        return None
+    escalador = previos[0] if previos else None
+    if escalador is not None and not isinstance(escalador, StandardScaler):
+        return None
+
+    pesos = np.ravel(final.coef_).astype(float)
+    intercepto = float(np.ravel(final.intercept_)[0])
+    centro = np.zeros_like(pesos)
+    if escalador is not None:
+        if escalador.scale_ is not None:
+            pesos = pesos / escalador.scale_
+        if escalador.mean_ is not None:
+            centro = np.asarray(escalador.mean_, dtype=float)
+            intercepto -= float(centro @ pesos)
+    media = centro if X_fondo is None else np.asarray(X_fondo, dtype=float).mean(axis=0)
+
+    return {
+        "metodo": "lineal",
+        "pesos": pesos,
+        "media": media,
+        "base": intercepto + float(media @ pesos),
+    }
+
+
+def _explicador_arboles(modelo, n_features: int) -> Optional[Dict[str, Any]]:
+    """
+    Contribuciones por ruta (Saabas) sobre los árboles aplanados: para cada nodo,
+    el cambio de valor respecto a su padre se asigna a la feature del split del
+    padre. Se guarda como matriz dispersa (nodos_totales x features) alineada con
+    las columnas de decision_path, así explicar un lote es un solo producto disperso.
+    """
+    if isinstance(modelo, RandomForestRegressor):
+        arboles = [e.tree_ for e in modelo.estimators_]
+    elif isinstance(modelo, DecisionTreeRegressor):
+        arboles = [modelo.tree_]
+    else:
+        return None
+
+    filas, cols, vals = [], [], []
+    desplazamiento = 0
+    base = 0.0
+    for t in arboles:
+        valor = t.value[:, 0, 0]
+        padre = np.full(t.node_count, -1)
+        for hijos in (t.children_left, t.children_right):
+            internos = np.flatnonzero(hijos >= 0)
+            padre[hijos[internos]] = internos
+        nodos = np.flatnonzero(padre >= 0)
+        filas.append(nodos + desplazamiento)
+        cols.append(t.feature[padre[nodos]])
+        vals.append(valor[nodos] - valor[padre[nodos]])
+        base += valor[0]
+        desplazamiento += t.node_count
+
+    n = len(arboles)
+    matriz = sparse.csr_matrix(
+        (np.concatenate(vals) / n, (np.concatenate(filas), np.concatenate(cols))),
+        shape=(desplazamiento, n_features),
+    )
+    return {"metodo": "ruta_arboles", "matriz": matriz, "base": base / n}
+
+
+def construir_explicador(modelo, n_features: int, X_fondo=None) -> Optional[Dict[str, Any]]:
+    """
+    Precalcula lo necesario para explicar el modelo (estadísticos de fondo y
+    árboles aplanados). Devuelve None si el tipo de modelo no está soportado.
+    """
+    return _explicador_lineal(modelo, X_fondo) or _explicador_arboles(modelo, n_features)
+
+
+def explicar(modelo, explicador: Dict[str, Any], X) -> Tuple[float, np.ndarray]:
+    """Contribuciones por feature (n x d) y valor base; base + suma de fila = predicción."""
+    if explicador["metodo"] == "lineal":
+        X = np.asarray(X, dtype=float)
+        return explicador["base"], (X - explicador["media"]) * explicador["pesos"]
+
+    camino = modelo.decision_path(X)
+    if isinstance(camino, tuple):
+        camino = camino[0]
+    return explicador["base"], (camino @ explicador["matriz"]).toarray()
@@ -1,8 +1,11 @@
+import time
+from datetime import datetime, timezone
 from fastapi import FastAPI, HTTPException, Query
 from src.api.preparar_datos import preparar
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from fastapi import Body
-from src.api.modelo import entrenar_y_guardar, predecir
+from src.api.modelo import entrenar_y_guardar, predecir, explicar_instancias, reporte_deriva
+from src.api.auditoria import obtener_registro
 
 app = FastAPI(title="Proyecto Final - Seminario", version="0.1.0")
 
@@ -15,12 +18,19 @@ def estado():
     return {"status": "ok"}
 
 @app.get("/data/prepare")
-def data_prepare(filename: str = Query(..., description="Nombre del CSV en data/raw")):
+def data_prepare(
+    filename: List[str] = Query(..., description="Nombre(s) del CSV en data/raw o patrón glob (p. ej. '*.csv')"),
+    output: Optional[str] = Query(None, description="Nombre simple (*.csv) del CSV consolidado en data/processed"),
+):
     """
-    Prepara el CSV de data/raw y guarda *_clean.csv en data/processed.
+    Prepara uno o varios CSV de data/raw y guarda un único *_clean.csv en data/processed.
+    Con varios archivos se procesan en paralelo y se reconcilian sobre un mismo
+    vocabulario one-hot e imputación global; 'archivos' trae el resumen por archivo.
     """
     try:
-        _, resumen, _ = preparar(filename)
+        _, resumen, _ = preparar(
+            filename[0] if len(filename) == 1 else filename, salida=output, devolver_df=False
+        )
         return resumen
     except FileNotFoundError as e:
         raise HTTPException(status_code=404, detail=str(e))
@@ -31,14 +41,26 @@ def data_prepare(filename: str = Query(..., description="Nombre del CSV en data/
 
 @app.post("/model/train")
 def model_train(
-    filename: str = Query("StudentPerformanceFactors_clean.csv", description="Nombre del CSV limpio en data/processed")
+    filename: str = Query("StudentPerformanceFactors_clean.csv", description="Nombre del CSV limpio en data/processed"),
+    p99_max_ms: Optional[float] = Query(None, description="Latencia p99 máxima por fila (ms)"),
+    tamano_max_mb: Optional[float] = Query(None, description="Tamaño máximo del modelo serializado (MB)"),
+    compactar: bool = Query(False, description="Incluir variantes compactas del RandomForest"),
+    presupuesto_s: Optional[float] = Query(None, description="Tiempo máximo de entrenamiento (s) con submuestreo progresivo"),
 ):
     """
     Entrena Ridge y RandomForest con el dataset limpio, elige el mejor por RMSE,
     guarda el modelo en data/processed/model.pkl y devuelve métricas.
+    Con presupuesto de latencia/tamaño elige el más preciso que lo cumpla.
+    Con presupuesto_s entrena sobre submuestras crecientes (curva de aprendizaje).
     """
     try:
-        return entrenar_y_guardar(filename)
+        return entrenar_y_guardar(
+            filename,
+            p99_max_ms=p99_max_ms,
+            tamano_max_mb=tamano_max_mb,
+            compactar=compactar,
+            presupuesto_s=presupuesto_s,
+        )
     except FileNotFoundError as e:
         raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
@@ -59,14 +81,81 @@ def model_predict(
       ]
     }
     Devuelve:
-      {"predicciones": [..], "n": N}
+      {"predicciones": [..], "n": N, "version_modelo": "..."}
+    Cada petición se encola en el log de auditoría (data/logs/*.jsonl) sin bloquear.
     """
+    inicio = time.perf_counter()
     try:
         if "instances" not in payload or not isinstance(payload["instances"], list):
             raise ValueError("El cuerpo debe incluir 'instances' como lista de objetos.")
 
-        return predecir(payload["instances"])
+        resultado = predecir(payload["instances"])
+        _auditar("/model/predict", payload, inicio, 200, resultado)
+        return resultado
     except FileNotFoundError as e:
+        _auditar("/model/predict", payload, inicio, 404)
         raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
-        raise HTTPException(status_code=400, detail=f"Error al predecir: {e}")
\ No newline at end of file
+        _auditar("/model/predict", payload, inicio, 400)
+        raise HTTPException(status_code=400, detail=f"Error al predecir: {e}")
+
+# Endpoint de explicaciones por lote
+
+@app.post("/model/explain")
+def model_explain(
+    payload: Dict[str, Any] = Body(..., description="JSON con 'instances': lista de objetos feature->valor")
+):
+    """
+    Mismo cuerpo que /model/predict. Devuelve, para cada instancia, la contribución
+    de cada feature (en el orden de 'features') respecto al valor 'base':
+      {"base": b, "features": [..], "contribuciones": [[..], ..], "predicciones": [..], "n": N}
+    """
+    try:
+        if "instances" not in payload or not isinstance(payload["instances"], list):
+            raise ValueError("El cuerpo debe incluir 'instances' como lista de objetos.")
+
+        return explicar_instancias(payload["instances"])
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Error al explicar: {e}")
+
+def _auditar(endpoint: str, payload: Dict[str, Any], inicio: float, status: int, resultado: Optional[Dict[str, Any]] = None):
+    """Encola la petición en el log de auditoría (se descarta si la cola está llena)."""
+    registro = obtener_registro()
+    if registro is None:
+        return
+    resultado = resultado or {}
+    registro.registrar({
+        "ts": datetime.now(timezone.utc).isoformat(),
+        "endpoint": endpoint,
+        "request": payload,
+        "status": status,
+        "predicciones": resultado.get("predicciones"),
+        "version_modelo": resultado.get("version_modelo"),
+        "latencia_ms": round((time.perf_counter() - inicio) * 1000, 3),
+    })
+
+# Endpoint de monitoreo de deriva
+
+@app.get("/monitoring/drift")
+def monitoring_drift():
+    """
+    Compara el tráfico servido por /model/predict con las distribuciones de
+    entrenamiento. Devuelve PSI y KS por feature y para la predicción.
+    """
+    try:
+        return reporte_deriva()
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Error en el monitoreo: {e}")
+
+
+@app.get("/monitoring/audit")
+def monitoring_audit():
+    """Contadores del log de auditoría: encoladas, escritas, descartadas y archivo actual."""
+    registro = obtener_registro()
+    if registro is None:
+        return {"habilitado": False}
+    return {"habilitado": True, **registro.estado()}
@@ -1,8 +1,14 @@
 # src/api/modelo.py
 from pathlib import Path
-from typing import Dict, Any, List, Tuple
+from typing import Dict, Any, List, Optional, Tuple
+import copy
+import io
 import math
+import time
+import uuid
+from datetime import datetime, timezone
 import joblib
+import numpy as np
 import pandas as pd
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
@@ -10,6 +16,10 @@ from sklearn.pipeline import Pipeline
 from sklearn.preprocessing import StandardScaler
 from sklearn.linear_model import Ridge
 from sklearn.ensemble import RandomForestRegressor
+from sklearn.tree import DecisionTreeRegressor
+
+from src.api.monitoreo import construir_referencia, obtener_monitor
+from src.api.explicaciones import construir_explicador, explicar
 
 PROC_DIR = Path("data/processed")
 PROC_DIR.mkdir(parents=True, exist_ok=True)
@@ -33,15 +43,191 @@ def _dividir_xy(df: pd.DataFrame, target: str = "Exam_Score") -> Tuple[pd.DataFr
 def _rmse(y_true, y_pred) -> float:
     return math.sqrt(mean_squared_error(y_true, y_pred))
 
+def _metricas(nombre: str, y_true, y_pred) -> Dict[str, Any]:
+    return {
+        "MAE": float(mean_absolute_error(y_true, y_pred)),
+        "RMSE": float(_rmse(y_true, y_pred)),
+        "R2": float(r2_score(y_true, y_pred)),
+        "modelo": nombre,
+    }
+
+def _medir_costo(modelo, X_muestra: pd.DataFrame, repeticiones: int = 300) -> Dict[str, float]:
+    """
+    Latencia p99 (ms) de predecir una fila, como en /model/predict, y tamaño
+    serializado del modelo (MB).
+    """
+    filas = [X_muestra.iloc[[i % len(X_muestra)]] for i in range(repeticiones)]
+    modelo.predict(filas[0])  # calentamiento
+    tiempos = []
+    for fila in filas:
+        t0 = time.perf_counter()
+        modelo.predict(fila)
+        tiempos.append((time.perf_counter() - t0) * 1000)
+
+    buffer = io.BytesIO()
+    joblib.dump(modelo, buffer)
+    return {
+        "p99_ms": float(np.percentile(tiempos, 99)),
+        "tamano_mb": buffer.getbuffer().nbytes / (1024 * 1024),
+    }
+
+def _compactar_bosque(
+    rf: RandomForestRegressor, X_train: pd.DataFrame, y_train: pd.Series, random_state: int
+) -> Dict[str, Any]:
+    """
+    Variantes compactas del RandomForest: poda de árboles (subconjunto de los ya
+    entrenados), bosque de profundidad limitada y destilación en un único árbol.
+    El maestro de la destilación son las predicciones out-of-bag del bosque: las
+    predicciones en muestra de un bosque sin límite de profundidad casi copian
+    y_train, y el árbol terminaría aprendiendo las etiquetas y no el bosque.
+    """
+    variantes: Dict[str, Any] = {}
+    for k in (100, 30):
+        if k < len(rf.estimators_):
+            podado = copy.copy(rf)
+            podado.estimators_ = rf.estimators_[:k]
+            podado.n_estimators = k
+            variantes[f"RandomForest_{k}_arboles"] = podado
+
+    limitado = RandomForestRegressor(
+        n_estimators=100, max_depth=10, n_jobs=-1, random_state=random_state
+    ).fit(X_train, y_train)
+    variantes["RandomForest_prof_10"] = limitado
+
+    if getattr(rf, "oob_prediction_", None) is not None:
+        maestro = np.ravel(rf.oob_prediction_)
+        con_oob = ~np.isnan(maestro)  # filas que cayeron en todos los bootstraps
+        variantes["Destilado_arbol_prof_8"] = DecisionTreeRegressor(
+            max_depth=8, random_state=random_state
+        ).fit(X_train[con_oob], maestro[con_oob])
+    return variantes
+
+def _construir_modelos(random_state: int) -> Tuple[Pipeline, RandomForestRegressor]:
+    ridge = Pipeline([
+        ("scaler", StandardScaler()),
+        ("model", Ridge(alpha=1.0, random_state=random_state))
+    ])
+
+    rf = RandomForestRegressor(
+        n_estimators=300, max_depth=None, n_jobs=-1, oob_score=True, random_state=random_state
+    )
+    return ridge, rf
+
+def _submuestra_estratificada(
+    X: pd.DataFrame, y: pd.Series, n: int, random_state: int
+) -> Tuple[pd.DataFrame, pd.Series]:
+    """
+    Submuestra de tamaño n estratificada por deciles del objetivo. Si lo que
+    quedaría fuera no alcanza para una fila por estrato se usa el conjunto completo;
+    si n no alcanza para una fila por estrato se muestrea sin estratificar.
+    """
+    estratos = pd.qcut(y, q=10, labels=False, duplicates="drop")
+    n_estratos = estratos.nunique()
+    if len(X) - n < n_estratos:
+        return X, y
+    X_s, _, y_s, _ = train_test_split(
+        X, y, train_size=n, stratify=estratos if n >= n_estratos else None, random_state=random_state
+    )
+    return X_s, y_s
+
+def _entrenar_con_presupuesto(
+    X_train: pd.DataFrame,
+    y_train: pd.Series,
+    presupuesto_s: float,
+    random_state: int,
+    n_inicial: int = 1000,
+    factor: float = 2.0,
+    tolerancia: float = 0.01,
+    fraccion_validacion: float = 0.2,
+) -> Tuple[Pipeline, RandomForestRegressor, pd.DataFrame, pd.Series, Dict[str, Any]]:
+    """
+    Entrena sobre submuestras estratificadas cada vez mayores (x factor) y se
+    detiene cuando el RMSE de validación deja de mejorar más de 'tolerancia'
+    (relativa), cuando se usan todos los datos o cuando el siguiente ajuste,
+    estimado por extrapolación lineal del último, no cabe en el presupuesto.
+
+    La validación sale de X_train, así el conjunto de prueba no participa en la
+    decisión de parada. El presupuesto solo cubre esta curva: el primer ajuste
+    (n_inicial filas) siempre se hace aunque lo supere.
+    Devuelve los modelos del último tamaño ajustado y el resumen de la curva.
+    """
+    inicio = time.perf_counter()
+    X_train, X_val, y_train, y_val = train_test_split(
+        X_train, y_train, test_size=fraccion_validacion, random_state=random_state
+    )
+    n_total = len(X_train)
+    n = min(n_inicial, n_total)
+    curva: List[Dict[str, Any]] = []
+    mejor_rmse = math.inf
+
+    while True:
+        t0 = time.perf_counter()
+        X_s, y_s = _submuestra_estratificada(X_train, y_train, n, random_state)
+        ridge, rf = _construir_modelos(random_state)
+        n = len(X_s)
+        ridge.fit(X_s, y_s)
+        rf.fit(X_s, y_s)
+        rmse_ridge = _rmse(y_val, ridge.predict(X_val))
+        rmse_rf = _rmse(y_val, rf.predict(X_val))
+        duracion = time.perf_counter() - t0
+        curva.append({
+            "n": int(n),
+            "RMSE_ridge": float(rmse_ridge),
+            "RMSE_random_forest": float(rmse_rf),
+            "segundos": float(duracion),
+        })
+
+        rmse = min(rmse_ridge, rmse_rf)
+        mejora = (mejor_rmse - rmse) / mejor_rmse if math.isfinite(mejor_rmse) else math.inf
+        mejor_rmse = min(mejor_rmse, rmse)
+        siguiente = min(int(n * factor), n_total)
+        transcurrido = time.perf_counter() - inicio
+
+        if n >= n_total:
+            motivo = "datos_completos"
+        elif mejora < tolerancia:
+            motivo = "meseta"
+        elif transcurrido + duracion * siguiente / n > presupuesto_s:
+            motivo = "presupuesto"
+        else:
+            n = siguiente
+            continue
+        break
+
+    return ridge, rf, X_s, y_s, {
+        "presupuesto_s": presupuesto_s,
+        "alcance_presupuesto": "curva de aprendizaje (sin evaluación, compactación ni guardado)",
+        "tamano_muestra": int(n),
+        "tamano_total": int(n_total),
+        "tamano_validacion": int(len(X_val)),
+        "tiempo_s": float(time.perf_counter() - inicio),
+        "motivo_parada": motivo,
+        "curva": curva,
+    }
+
 def entrenar_y_guardar(
     nombre_clean: str,
     model_path: Path = DEFAULT_MODEL_PATH,
     random_state: int = 42,
+    p99_max_ms: Optional[float] = None,
+    tamano_max_mb: Optional[float] = None,
+    compactar: bool = False,
+    presupuesto_s: Optional[float] = None,
 ) -> Dict[str, Any]:
     """
     Entrena dos modelos (Ridge y RandomForest), evalúa, elige el mejor por RMSE
     y guarda el mejor (model.pkl) junto con el orden de columnas.
+
+    Con presupuesto (p99_max_ms / tamano_max_mb) o compactar=True se mide la
+    latencia p99 por fila y el tamaño de cada candidato (incluidas las variantes
+    compactas del bosque) y se elige el de menor RMSE que cumpla el presupuesto.
+
+    Con presupuesto_s se entrena sobre submuestras crecientes hasta que el RMSE
+    (en una validación separada de train) se estabiliza o se agota el tiempo
+    (ver metrics["muestreo"]). El presupuesto acota la curva de aprendizaje; si
+    ya se agotó, la compactación se omite. El tiempo total se informa aparte.
     """
+    inicio = time.perf_counter()
     df = _cargar_clean(nombre_clean)
     X, y = _dividir_xy(df, target="Exam_Score")
 
@@ -50,63 +236,141 @@ def entrenar_y_guardar(
         X, y, test_size=0.2, random_state=random_state
     )
 
-    # Modelos
-    ridge = Pipeline([
-        ("scaler", StandardScaler()),
-        ("model", Ridge(alpha=1.0, random_state=random_state))
-    ])
-
-    rf = RandomForestRegressor(
-        n_estimators=300, max_depth=None, n_jobs=-1, random_state=random_state
-    )
-
-    # Entrenar
-    ridge.fit(X_train, y_train)
-    rf.fit(X_train, y_train)
+    # Modelos + entrenar (con presupuesto de tiempo: curva de aprendizaje sobre submuestras)
+    muestreo = None
+    if presupuesto_s is not None:
+        ridge, rf, X_train, y_train, muestreo = _entrenar_con_presupuesto(
+            X_train, y_train, presupuesto_s, random_state
+        )
+    else:
+        ridge, rf = _construir_modelos(random_state)
+        ridge.fit(X_train, y_train)
+        rf.fit(X_train, y_train)
 
     # Evaluar
     preds_ridge = ridge.predict(X_test)
     preds_rf = rf.predict(X_test)
 
-    metrics_ridge = {
-        "MAE": float(mean_absolute_error(y_test, preds_ridge)),
-        "RMSE": float(_rmse(y_test, preds_ridge)),
-        "R2": float(r2_score(y_test, preds_ridge)),
-        "modelo": "Ridge",
-    }
-    metrics_rf = {
-        "MAE": float(mean_absolute_error(y_test, preds_rf)),
-        "RMSE": float(_rmse(y_test, preds_rf)),
-        "R2": float(r2_score(y_test, preds_rf)),
-        "modelo": "RandomForest",
-    }
+    metrics_ridge = _metricas("Ridge", y_test, preds_ridge)
+    metrics_rf = _metricas("RandomForest", y_test, preds_rf)
 
     # Seleccionar mejor por RMSE
     mejor, obj = (metrics_rf, rf) if metrics_rf["RMSE"] < metrics_ridge["RMSE"] else (metrics_ridge, ridge)
+    metrics: Dict[str, Any] = {"ridge": metrics_ridge, "random_forest": metrics_rf, "mejor": mejor}
+    if muestreo is not None:
+        metrics["muestreo"] = muestreo
+
+    # Selección con presupuesto de latencia / tamaño
+    if compactar or p99_max_ms is not None or tamano_max_mb is not None:
+        candidatos = {"Ridge": ridge, "RandomForest": rf}
+        if compactar and muestreo is not None and time.perf_counter() - inicio >= presupuesto_s:
+            # Sin tiempo restante: se comparan solo los modelos ya entrenados
+            muestreo["compactacion_omitida"] = True
+        elif compactar:
+            candidatos.update(_compactar_bosque(rf, X_train, y_train, random_state))
+        # Mismo paralelismo para todos: se miden y se guardan prediciendo con n_jobs=1,
+        # que para lotes pequeños evita el costo de lanzar hilos en cada predict
+        for modelo in candidatos.values():
+            if hasattr(modelo, "n_jobs"):
+                modelo.n_jobs = 1
+
+        tabla = []
+        for nombre, modelo in candidatos.items():
+            fila = _metricas(nombre, y_test, modelo.predict(X_test))
+            fila.update(_medir_costo(modelo, X_test))
+            fila["cumple"] = (
+                (p99_max_ms is None or fila["p99_ms"] <= p99_max_ms)
+                and (tamano_max_mb is None or fila["tamano_mb"] <= tamano_max_mb)
+            )
+            tabla.append(fila)
+
+        validos = [f for f in tabla if f["cumple"]]
+        # Si ninguno cumple, se queda el más rápido y se informa
+        elegido = min(validos, key=lambda f: f["RMSE"]) if validos else min(tabla, key=lambda f: f["p99_ms"])
+        obj = candidatos[elegido["modelo"]]
+        mejor = {k: elegido[k] for k in ("MAE", "RMSE", "R2", "modelo")}
+        metrics.update({
+            "mejor": mejor,
+            "candidatos": tabla,
+            "presupuesto": {
+                "p99_max_ms": p99_max_ms,
+                "tamano_max_mb": tamano_max_mb,
+                "cumplido": bool(validos),
+            },
+        })
+
+    # Distribuciones de referencia para el monitoreo de deriva
+    referencia = construir_referencia(X_train, obj.predict(X_test))
 
     # Guardar modelo + metadatos mínimos
+    version = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ") + "-" + uuid.uuid4().hex[:8]
     payload = {
         "model": obj,
         "feature_names": list(X.columns),
         "target": "Exam_Score",
         "dataset": nombre_clean,
-        "metrics": {"ridge": metrics_ridge, "random_forest": metrics_rf, "mejor": mejor},
+        "version": version,
+        "metrics": metrics,
+        "referencia": referencia,
     }
+    if muestreo is not None:
+        muestreo["tiempo_total_s"] = float(time.perf_counter() - inicio)
     joblib.dump(payload, model_path)
 
+    # Estadísticos de fondo / árboles aplanados para /model/explain, en un archivo
+    # aparte para que /model/predict no pague su deserialización
+    explicador = construir_explicador(obj, X.shape[1], X_train)
+    if explicador is not None:
+        joblib.dump({**explicador, "version": version}, _ruta_explicador(model_path))
+
     return {
         "ok": True,
         "ruta_modelo": str(model_path),
         "dataset": nombre_clean,
-        "metrics": {"ridge": metrics_ridge, "random_forest": metrics_rf, "mejor": mejor},
+        "version": version,
+        "metrics": metrics,
         "features": payload["feature_names"],
     }
 
+def _ruta_explicador(model_path: Path) -> Path:
+    return model_path.with_name(model_path.stem + "_explicador.pkl")
+
+# Explicadores ya cargados, por ruta del modelo (se recargan si cambia la versión)
+_EXPLICADORES: Dict[str, Dict[str, Any]] = {}
+
+def _cargar_explicador(bundle: Dict[str, Any], model_path: Path) -> Optional[Dict[str, Any]]:
+    version = bundle.get("version")
+    explicador = _EXPLICADORES.get(str(model_path))
+    if explicador is not None and explicador.get("version") == version:
+        return explicador
+
+    ruta = _ruta_explicador(model_path)
+    explicador = joblib.load(ruta) if ruta.exists() else None
+    if explicador is None or explicador.get("version") != version:
+        # Modelos anteriores no traen el explicador: se construye al vuelo
+        explicador = construir_explicador(bundle["model"], len(bundle["feature_names"]))
+        if explicador is None:
+            return None
+        explicador["version"] = version
+    _EXPLICADORES[str(model_path)] = explicador
+    return explicador
+
 def _cargar_modelo(model_path: Path = DEFAULT_MODEL_PATH) -> Dict[str, Any]:
     if not model_path.exists():
         raise FileNotFoundError(f"No se encontró el modelo en {model_path}. Entrena primero.")
     return joblib.load(model_path)
 
+def _alinear(instancias: List[Dict[str, Any]], feature_names: List[str]) -> pd.DataFrame:
+    # Construir DataFrame desde el JSON
+    X_in = pd.DataFrame(instancias)
+
+    # Alinear columnas al orden esperado por el modelo
+    for col in feature_names:
+        if col not in X_in.columns:
+            X_in[col] = 0 
+    # Ignorar columnas no esperadas
+    return X_in[feature_names]
+
 def predecir(
     instancias: List[Dict[str, Any]],
     model_path: Path = DEFAULT_MODEL_PATH
@@ -117,17 +381,52 @@ def predecir(
     """
     bundle = _cargar_modelo(model_path)
     model = bundle["model"]
-    feature_names: List[str] = bundle["feature_names"]
+    X_in = _alinear(instancias, bundle["feature_names"])
 
-    # Construir DataFrame desde el JSON
-    X_in = pd.DataFrame(instancias)
+    preds = model.predict(X_in)
 
-    # Alinear columnas al orden esperado por el modelo
-    for col in feature_names:
-        if col not in X_in.columns:
-            X_in[col] = 0 
-    # Ignorar columnas no esperadas
-    X_in = X_in[feature_names]
+    monitor = obtener_monitor(bundle)
+    if monitor is not None:
+        monitor.registrar(X_in.to_numpy(dtype=float), preds)
 
-    preds = model.predict(X_in)
-    return {"predicciones": [float(p) for p in preds], "n": len(preds)}
+    return {"predicciones": [float(p) for p in preds], "n": len(preds), "version_modelo": bundle.get("version")}
+
+def reporte_deriva(model_path: Path = DEFAULT_MODEL_PATH) -> Dict[str, Any]:
+    """
+    PSI y KS por feature (y de la predicción) del tráfico servido desde el último
+    entrenamiento contra las distribuciones de referencia guardadas en el bundle.
+    """
+    bundle = _cargar_modelo(model_path)
+    monitor = obtener_monitor(bundle)
+    if monitor is None:
+        raise ValueError("El modelo no trae distribuciones de referencia. Reentrena para habilitar el monitoreo.")
+    return monitor.reporte(bundle["feature_names"])
+
+def explicar_instancias(
+    instancias: List[Dict[str, Any]],
+    model_path: Path = DEFAULT_MODEL_PATH
+) -> Dict[str, Any]:
+    """
+    Contribución de cada feature a la predicción de cada instancia.
+    base + suma(contribuciones de la fila) = predicción.
+    Ridge: coeficientes plegados con el scaler; RandomForest: contribuciones por ruta.
+    """
+    bundle = _cargar_modelo(model_path)
+    model = bundle["model"]
+    feature_names: List[str] = bundle["feature_names"]
+    X_in = _alinear(instancias, feature_names)
+
+    explicador = _cargar_explicador(bundle, model_path)
+    if explicador is None:
+        raise ValueError(f"Modelo no soportado para explicaciones: {type(model).__name__}")
+
+    base, contribuciones = explicar(model, explicador, X_in)
+    return {
+        "metodo": explicador["metodo"],
+        "base": float(base),
+        "features": feature_names,
+        "contribuciones": contribuciones.tolist(),
+        "predicciones": (base + contribuciones.sum(axis=1)).tolist(),
+        "n": len(contribuciones),
+        "version_modelo": bundle.get("version"),
+    }
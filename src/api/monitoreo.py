@@ -0,0 +1,178 @@
+# src/api/monitoreo.py
+from threading import Lock
+from typing import Dict, Any, List, Optional
+import numpy as np
+
+# Histogramas por cuantiles: N_BINS intervalos -> N_BINS - 1 cortes interiores
+N_BINS = 10
+# Suavizado para evitar log(0) en el PSI
+EPS = 1e-4
+# Umbral clásico de PSI a partir del cual se considera deriva relevante
+UMBRAL_PSI = 0.2
+
+
+def _cortes(valores: np.ndarray) -> np.ndarray:
+    """Cortes interiores por cuantiles, sin repetidos y rellenados con +inf a N_BINS - 1."""
+    valores = valores[~np.isnan(valores)]
+    if valores.size == 0:
+        unicos = np.array([], dtype=float)
+    else:
+        qs = np.linspace(0, 1, N_BINS + 1)[1:-1]
+        unicos = np.unique(np.quantile(valores, qs))
+    cortes = np.full(N_BINS - 1, np.inf)
+    cortes[: unicos.size] = unicos
+    return cortes
+
+
+def _contar(X: np.ndarray, cortes: np.ndarray) -> np.ndarray:
+    """
+    Cuenta filas por bin para todas las columnas a la vez.
+    X: (n, d); cortes: (d, N_BINS - 1). Devuelve (d, N_BINS).
+    Un único bincount sobre índices desplazados por columna (sin bucles en Python).
+    """
+    d = cortes.shape[0]
+    idx = (X[:, :, None] >= cortes[None, :, :]).sum(axis=2)
+    idx += np.arange(d) * N_BINS
+    return np.bincount(idx.ravel(), minlength=d * N_BINS).reshape(d, N_BINS)
+
+
+def construir_referencia(X, preds) -> Dict[str, Any]:
+    """
+    Distribuciones de referencia (histogramas por cuantiles) de cada feature y de
+    la predicción, calculadas al entrenar y guardadas en el bundle del modelo.
+    """
+    X = np.asarray(X, dtype=float)
+    p = np.asarray(preds, dtype=float).reshape(-1, 1)
+    cortes_x = np.vstack([_cortes(X[:, j]) for j in range(X.shape[1])])
+    cortes_p = _cortes(p[:, 0]).reshape(1, -1)
+    return {
+        "cortes": cortes_x,
+        "conteos": _contar(X, cortes_x),
+        "cortes_pred": cortes_p,
+        "conteos_pred": _contar(p, cortes_p),
+    }
+
+
+def _psi(esperado: np.ndarray, actual: np.ndarray) -> np.ndarray:
+    e = np.clip(esperado / np.maximum(esperado.sum(axis=1, keepdims=True), 1), EPS, None)
+    a = np.clip(actual / np.maximum(actual.sum(axis=1, keepdims=True), 1), EPS, None)
+    return ((a - e) * np.log(a / e)).sum(axis=1)
+
+
+def _ks(esperado: np.ndarray, actual: np.ndarray) -> np.ndarray:
+    """Estadístico KS aproximado: máxima diferencia entre las CDF de los histogramas."""
+    ce = np.cumsum(esperado, axis=1) / np.maximum(esperado.sum(axis=1, keepdims=True), 1)
+    ca = np.cumsum(actual, axis=1) / np.maximum(actual.sum(axis=1, keepdims=True), 1)
+    return np.abs(ce - ca).max(axis=1)
+
+
+def _desde_acumulado(mayores: np.ndarray, n: int) -> np.ndarray:
+    """
+    Convierte conteos acumulados (filas con x >= corte_k) en conteos por bin.
+    Los cortes son crecientes, así que bin_k = mayores_{k-1} - mayores_k.
+    """
+    d = mayores.shape[0]
+    borde_izq = np.hstack([np.full((d, 1), n), mayores])
+    borde_der = np.hstack([mayores, np.zeros((d, 1), dtype=mayores.dtype)])
+    return borde_izq - borde_der
+
+
+class MonitorDeriva:
+    """
+    Histogramas en streaming de features y predicciones del tráfico en vivo.
+    Internamente se cuentan, por feature y corte, las filas con x >= corte: una
+    fila cuesta una comparación y una suma in-place (sin bincount ni reshape),
+    que es el caso común de /model/predict. Memoria acotada ((d + 1) x cortes
+    enteros), un solo lock por lote y conteos sumables: dos monitores con la
+    misma referencia se pueden fusionar.
+    """
+
+    def __init__(self, referencia: Dict[str, Any], version: Optional[str] = None):
+        self.referencia = referencia
+        self.version = version
+        self._lock = Lock()
+        # Última fila = predicción
+        self._cortes = np.vstack([referencia["cortes"], referencia["cortes_pred"]])
+        self._mayores = np.zeros(self._cortes.shape, dtype=np.int64)
+        self.n = 0
+
+    def registrar(self, X, preds) -> None:
+        X = np.asarray(X, dtype=float)
+        p = np.asarray(preds, dtype=float)
+        if X.shape[0] == 1:
+            fila = np.concatenate((X[0], p.reshape(-1)))
+            mayores = fila[:, None] >= self._cortes
+        else:
+            filas = np.column_stack((X, p))
+            mayores = (filas[:, :, None] >= self._cortes[None, :, :]).sum(axis=0)
+        with self._lock:
+            np.add(self._mayores, mayores, out=self._mayores)
+            self.n += X.shape[0]
+
+    def fusionar(self, otro: "MonitorDeriva") -> None:
+        """Suma los conteos de otro monitor del mismo modelo (misma versión y cortes)."""
+        if otro.version != self.version or not np.array_equal(otro._cortes, self._cortes):
+            raise ValueError(
+                f"No se pueden fusionar monitores de modelos distintos ({self.version} vs {otro.version})."
+            )
+        with otro._lock:
+            mayores, n = otro._mayores.copy(), otro.n
+        with self._lock:
+            self._mayores += mayores
+            self.n += n
+
+    def _conteos(self):
+        with self._lock:
+            mayores, n = self._mayores.copy(), self.n
+        conteos = _desde_acumulado(mayores, n)
+        return conteos[:-1], conteos[-1:], n
+
+    @property
+    def conteos(self) -> np.ndarray:
+        return self._conteos()[0]
+
+    @property
+    def conteos_pred(self) -> np.ndarray:
+        return self._conteos()[1]
+
+    def reporte(self, feature_names: List[str]) -> Dict[str, Any]:
+        conteos, conteos_pred, n = self._conteos()
+
+        ref = self.referencia
+        psi = _psi(ref["conteos"], conteos)
+        ks = _ks(ref["conteos"], conteos)
+        psi_p = _psi(ref["conteos_pred"], conteos_pred)
+        ks_p = _ks(ref["conteos_pred"], conteos_pred)
+
+        features = {
+            f: {"psi": float(psi[j]), "ks": float(ks[j])} for j, f in enumerate(feature_names)
+        }
+        return {
+            "n_filas": int(n),
+            "version_modelo": self.version,
+            "umbral_psi": UMBRAL_PSI,
+            "features": features if n else {},
+            "prediccion": {"psi": float(psi_p[0]), "ks": float(ks_p[0])} if n else {},
+            "features_con_deriva": [f for f, v in features.items() if v["psi"] >= UMBRAL_PSI] if n else [],
+        }
+
+
+# Monitor activo: se reinicia cuando cambia la versión del modelo servido
+_MONITOR: Optional[MonitorDeriva] = None
+_MONITOR_LOCK = Lock()
+
+
+def obtener_monitor(bundle: Dict[str, Any]) -> Optional[MonitorDeriva]:
+    """Devuelve el monitor del modelo del bundle (None si el bundle no trae referencia)."""
+    global _MONITOR
+    referencia = bundle.get("referencia")
+    if referencia is None:
+        return None
+    version = bundle.get("version")
+    monitor = _MONITOR
+    if monitor is not None and monitor.version == version:
+        return monitor
+    with _MONITOR_LOCK:
+        if _MONITOR is None or _MONITOR.version != version:
+            _MONITOR = MonitorDeriva(referencia, version)
+        return _MONITOR
@@ -1,5 +1,9 @@
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
 from pathlib import Path
-from typing import Tuple, Dict, Any
+from typing import Tuple, Dict, Any, List, Optional, Union
 import pandas as pd
 
 # Carpetas
@@ -76,9 +80,17 @@ def asegurar_numericos(df: pd.DataFrame) -> pd.DataFrame:
     return df
 
 # Pipeline principal
-
-def preparar(nombre: str) -> Tuple[pd.DataFrame, Dict[str, Any], str]:
-    df = cargar_csv(nombre).copy()
+#
+# Dos pasadas para que el trabajo pesado escale con los núcleos:
+#   1) cada proceso lee y codifica su archivo y devuelve solo estadísticos
+#      (columnas, categorías nominales y conteos de valores por columna);
+#   2) el proceso padre arma el esquema global (vocabulario one-hot, valores de
+#      imputación y orden de columnas) y cada proceso lo aplica a su archivo y
+#      escribe su parte; el padre solo concatena las partes.
+
+def _codificar_archivo(ruta: Path) -> Tuple[pd.DataFrame, List[str]]:
+    """Lectura, columnas descartadas, binarios y ordinales de un archivo."""
+    df = pd.read_csv(ruta)
 
     # 0) quitar columnas irrelevantes si existen
     cols_drop = [c for c in DROP_COLS if c in df.columns]
@@ -89,58 +101,217 @@ def preparar(nombre: str) -> Tuple[pd.DataFrame, Dict[str, Any], str]:
     df = aplicar_yes_no(df)
     # 2) ordinales
     df = aplicar_ordinales(df)
-    # 3) nominales -> one-hot
-    df = aplicar_one_hot(df)
-    # 4) nulos
-    df = rellenar_nulos(df)
-    # 5) asegurar numéricos
-    df = asegurar_numericos(df)
-
-    # 6) guardar
-    salida = PROC_DIR / (Path(nombre).stem + "_clean.csv")
-    df.to_csv(salida, index=False)
+    return df, cols_drop
+
+def _estadisticos(df: pd.DataFrame) -> Dict[str, Any]:
+    """Estadísticos sumables entre archivos para construir el esquema global."""
+    nominales = [c for c in df.columns if c in ONE_HOT_COLS]
+    return {
+        "columnas": list(df.columns),
+        "numericas": {c: pd.api.types.is_numeric_dtype(df[c]) for c in df.columns if c not in ONE_HOT_COLS},
+        "categorias": {c: set(df[c].dropna().unique()) for c in nominales},
+        "conteos": {c: df[c].value_counts(dropna=True) for c in df.columns},
+    }
 
-    resumen = {
+def _resumen_archivo(df: pd.DataFrame, cols_drop: List[str], est: Dict[str, Any]) -> Dict[str, Any]:
+    return {
         "filas": int(df.shape[0]),
-        "columnas": int(df.shape[1]),
-        "archivo_salida": str(salida),
         "columnas_eliminadas": cols_drop,
-        "dummies_generadas": [c for c in df.columns if c.startswith("School_Type_") or c.startswith("Gender_")],
+        "nulos": int(df.isna().sum().sum()),
+        "categorias": {c: sorted(str(v) for v in cats) for c, cats in est["categorias"].items()},
     }
-    return df, resumen, str(salida)
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
 
+def _estadisticos_archivo(ruta: Path) -> Dict[str, Any]:
+    """Primera pasada (en un proceso del pool)."""
+    df, cols_drop = _codificar_archivo(ruta)
+    est = _estadisticos(df)
+    est["resumen"] = _resumen_archivo(df, cols_drop, est)
+    return est
+
+def _mediana_ponderada(conteos: pd.Series) -> Any:
+    """Mediana (como pandas: promedio de los dos centrales si n es par) desde conteos."""
+    conteos = conteos.sort_index()
+    n = int(conteos.sum())
+    if n == 0:
+        return None
+    acumulado = conteos.cumsum().to_numpy()
+    valores = conteos.index.to_numpy()
+    bajo = valores[acumulado.searchsorted((n - 1) // 2, side="right")]
+    alto = valores[acumulado.searchsorted(n // 2, side="right")]
+    return (bajo + alto) / 2
+
+def _moda(conteos: pd.Series) -> Any:
+    """Moda (como pandas: la menor entre empates) desde conteos."""
+    if conteos.empty:
+        return "Desconocido"
+    return sorted(conteos[conteos == conteos.max()].index)[0]
+
+def _conteos_totales(estadisticos: List[Dict[str, Any]], col: str) -> pd.Series:
+    conteos = [est["conteos"][col] for est in estadisticos if col in est["conteos"]]
+    return pd.concat(conteos).groupby(level=0).sum()
+
+def _esquema_global(estadisticos: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Une los estadísticos por archivo: columnas, dummies (drop_first) e imputación.
+    Una nominal ausente en un archivo se rellena con su moda global; si no, todas
+    sus dummies quedarían en False y equivaldrían en silencio a la categoría descartada.
+    """
+    base: List[str] = []
+    nominales: List[str] = []
+    for est in estadisticos:
+        for c in est["columnas"]:
+            destino = nominales if c in ONE_HOT_COLS else base
+            if c not in destino:
+                destino.append(c)
+
+    # Dummies en el orden en que aparecen las columnas nominales en los datos
+    vocabulario = {}
+    modas_nominales = {}
+    for col in nominales:
+        categorias = sorted(set().union(*(est["categorias"].get(col, set()) for est in estadisticos)))
+        vocabulario[col] = categorias[1:]
+        modas_nominales[col] = _moda(_conteos_totales(estadisticos, col))
+
+    relleno = {}
+    for col in base:
+        total = _conteos_totales(estadisticos, col)
+        if all(est["numericas"][col] for est in estadisticos if col in est["numericas"]):
+            valor = _mediana_ponderada(total)
+            if valor is not None:
+                relleno[col] = valor
+        else:
+            relleno[col] = _moda(total)
+
+    dummies = [f"{col}_{cat}" for col, cats in vocabulario.items() for cat in cats]
+    return {
+        "columnas": base + dummies,
+        "vocabulario": vocabulario,
+        "modas_nominales": modas_nominales,
+        "relleno": relleno,
+    }
 
+def _aplicar_esquema(df: pd.DataFrame, esquema: Dict[str, Any]) -> pd.DataFrame:
+    # 3) nominales -> one-hot con el vocabulario global
+    for col, categorias in esquema["vocabulario"].items():
+        if col in df.columns:
+            valores = df[col]
+        else:
+            valores = pd.Series(esquema["modas_nominales"][col], index=df.index, dtype=object)
+        for cat in categorias:
+            df[f"{col}_{cat}"] = valores == cat
+    df = df.drop(columns=[c for c in esquema["vocabulario"] if c in df.columns])
+
+    # 4) nulos con los estadísticos globales (columnas ausentes incluidas)
+    for col, valor in esquema["relleno"].items():
+        if col not in df.columns:
+            df[col] = int(valor) if isinstance(valor, float) and valor.is_integer() else valor
+        elif df[col].isna().any():
+            df[col] = df[col].fillna(valor)
+    df = df.reindex(columns=esquema["columnas"])
 
+    # 5) asegurar numéricos
+    return asegurar_numericos(df)
+
+def _escribir_parte(ruta: Path, esquema: Dict[str, Any], destino: Path) -> None:
+    """Segunda pasada (en un proceso del pool): aplica el esquema y escribe la parte sin encabezado."""
+    df, _ = _codificar_archivo(ruta)
+    _aplicar_esquema(df, esquema).to_csv(destino, index=False, header=False)
+
+def _validar_entrada(nombre: str) -> str:
+    """Los nombres y patrones de entrada son rutas relativas dentro de data/raw."""
+    ruta = Path(nombre)
+    if ruta.is_absolute() or ".." in ruta.parts:
+        raise ValueError(f"Nombre de entrada no válido: '{nombre}'. Debe ser una ruta relativa dentro de data/raw")
+    return nombre
+
+def _resolver_archivos(nombre: Union[str, List[str]]) -> List[str]:
+    """
+    Acepta un nombre, una lista de nombres o un patrón glob dentro de data/raw
+    (subcarpetas incluidas, p. ej. 'lote/*.csv'); devuelve rutas relativas a data/raw.
+    """
+    if isinstance(nombre, str):
+        if any(ch in _validar_entrada(nombre) for ch in "*?["):
+            nombres = sorted(str(p.relative_to(RAW_DIR)) for p in RAW_DIR.glob(nombre) if p.is_file())
+            if not nombres:
+                raise FileNotFoundError(f"Ningún archivo de data/raw coincide con '{nombre}'")
+            return nombres
+        nombres = [nombre]
+    else:
+        if not nombre:
+            raise ValueError("La lista de archivos está vacía.")
+        nombres = [_validar_entrada(n) for n in nombre]
+    for n in nombres:
+        if not (RAW_DIR / n).exists():
+            raise FileNotFoundError(f"No se encontró data/raw/{n}")
+    return nombres
+
+def _validar_salida(salida: str) -> str:
+    """El archivo de salida debe ser un nombre simple *.csv dentro de data/processed."""
+    if Path(salida).name != salida or salida in {".", ".."} or not salida.endswith(".csv"):
+        raise ValueError(f"Nombre de salida no válido: '{salida}'. Usa un nombre simple terminado en .csv")
+    return salida
+
+def preparar(
+    nombre: Union[str, List[str]],
+    salida: Optional[str] = None,
+    max_workers: Optional[int] = None,
+    devolver_df: bool = True,
+) -> Tuple[Optional[pd.DataFrame], Dict[str, Any], str]:
+    """
+    Prepara uno o varios CSV de data/raw (nombre, lista o glob) y guarda un único
+    *_clean.csv en data/processed. Con varios archivos cada pasada se reparte en un
+    pool de procesos (spawn) y todos comparten vocabulario one-hot e imputación.
+    Con devolver_df=False se devuelve df = None (con varios archivos, además, no
+    se relee el consolidado).
+    """
+    nombres = _resolver_archivos(nombre)
+    rutas = [RAW_DIR / n for n in nombres]
+    if salida is None:
+        salida = Path(nombres[0]).stem + "_clean.csv" if len(nombres) == 1 else "consolidado_clean.csv"
+    destino = PROC_DIR / _validar_salida(salida)
+
+    if len(rutas) == 1:
+        # Un archivo: una sola lectura, sin pool
+        df, cols_drop = _codificar_archivo(rutas[0])
+        est = _estadisticos(df)
+        estadisticos = [est]
+        por_archivo = [{"archivo": nombres[0], **_resumen_archivo(df, cols_drop, est)}]
+        esquema = _esquema_global(estadisticos)
+        df = _aplicar_esquema(df, esquema)
+        df.to_csv(destino, index=False)
+        if not devolver_df:
+            df = None
+    else:
+        workers = min(len(rutas), max_workers or os.cpu_count() or 1)
+        partes = [destino.with_name(f".{destino.stem}.parte{i}.csv") for i in range(len(rutas))]
+        # spawn: la API corre en hilos de uvicorn y hacer fork desde ahí no es seguro
+        with ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn")) as pool:
+            estadisticos = list(pool.map(_estadisticos_archivo, rutas))
+            por_archivo = [{"archivo": n, **est.pop("resumen")} for n, est in zip(nombres, estadisticos)]
+            esquema = _esquema_global(estadisticos)
+            list(pool.map(_escribir_parte, rutas, [esquema] * len(rutas), partes))
+        try:
+            with open(destino, "w", encoding="utf-8", newline="") as out:
+                out.write(",".join(esquema["columnas"]) + "\n")
+                for parte in partes:
+                    with open(parte, encoding="utf-8", newline="") as fh:
+                        shutil.copyfileobj(fh, out)
+        finally:
+            for parte in partes:
+                parte.unlink(missing_ok=True)
+        df = pd.read_csv(destino) if devolver_df else None
+
+    todas = set().union(*(est["columnas"] for est in estadisticos))
+    for resumen_archivo, est in zip(por_archivo, estadisticos):
+        resumen_archivo["columnas_faltantes"] = sorted(todas - set(est["columnas"]))
+
+    columnas = esquema["columnas"]
+    resumen = {
+        "filas": sum(p["filas"] for p in por_archivo),
+        "columnas": len(columnas),
+        "archivo_salida": str(destino),
+        "columnas_eliminadas": sorted({c for p in por_archivo for c in p["columnas_eliminadas"]}),
+        "dummies_generadas": [c for c in columnas if c.startswith("School_Type_") or c.startswith("Gender_")],
+        "archivos": por_archivo,
+    }
+    return df, resumen, str(destino)
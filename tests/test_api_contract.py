@@ -1,7 +1,9 @@
 import pytest
+import pandas as pd
 from fastapi.testclient import TestClient
 from pathlib import Path
 
+from src.api import auditoria
 from src.api.main import app
 
 client = TestClient(app)
@@ -9,6 +11,16 @@ client = TestClient(app)
 
 # ---------- Fixtures ----------
 
+@pytest.fixture(scope="module", autouse=True)
+def audit_log_temporal(tmp_path_factory):
+    """El log de auditoría de la API escribe en un directorio temporal, no en data/logs."""
+    registro = auditoria.RegistroAuditoria(tmp_path_factory.mktemp("logs"), intervalo_s=0.05).iniciar()
+    anterior, auditoria._REGISTRO = auditoria._REGISTRO, registro
+    yield registro
+    registro.cerrar()
+    auditoria._REGISTRO = anterior
+
+
 @pytest.fixture(scope="session")
 def ensure_model_trained():
     """
@@ -101,4 +113,153 @@ def test_predict_smoke_example(ensure_model_trained):
     assert "predicciones" in body and "n" in body
     assert body["n"] == 1
     assert isinstance(body["predicciones"], list) and len(body["predicciones"]) == 1
-    assert isinstance(body["predicciones"][0], (int, float))
\ No newline at end of file
+    assert isinstance(body["predicciones"][0], (int, float))
+
+
+def test_audit_counts_predict_requests(audit_log_temporal):
+    """Cada /model/predict queda encolado en el log de auditoría (directorio temporal)."""
+    antes = client.get("/monitoring/audit").json()
+    client.post("/model/predict", json={"instances": [{}]})
+    despues = client.get("/monitoring/audit").json()
+    assert despues["habilitado"] and despues["writer_vivo"]
+    assert despues["encoladas"] == antes["encoladas"] + 1
+    assert despues["archivo_actual"] is None or Path(despues["archivo_actual"]).parent == audit_log_temporal.directorio
+
+def test_drift_report_after_predict(ensure_model_trained):
+    """
+    /monitoring/drift responde 200 tras servir predicciones y reporta PSI/KS por feature.
+    """
+    resp = client.post("/model/predict", json={"instances": [{"Hours_Studied": 10}] * 5})
+    assert resp.status_code == 200, f"Respuesta inesperada: {resp.text}"
+
+    resp = client.get("/monitoring/drift")
+    assert resp.status_code == 200, f"Respuesta inesperada: {resp.text}"
+    body = resp.json()
+    assert body["n_filas"] >= 5
+    assert set(body["features"]) == set(ensure_model_trained["features"])
+    assert all({"psi", "ks"} <= set(v) for v in body["features"].values())
+    assert "psi" in body["prediccion"]
+
+    # Un lote claramente fuera de rango en Hours_Studied dispara la deriva de esa feature
+    resp = client.post("/model/predict", json={"instances": [{"Hours_Studied": 500}] * 50})
+    assert resp.status_code == 200, f"Respuesta inesperada: {resp.text}"
+    body = client.get("/monitoring/drift").json()
+    assert body["features"]["Hours_Studied"]["psi"] > body["umbral_psi"]
+    assert "Hours_Studied" in body["features_con_deriva"]
+
+
+def test_explain_contract(ensure_model_trained):
+    """
+    /model/explain devuelve una contribución por feature y base + suma = predicción.
+    """
+    instances = [{"Hours_Studied": 10, "Attendance": 92}, {"Hours_Studied": 25, "Attendance": 70}]
+    resp = client.post("/model/explain", json={"instances": instances})
+    assert resp.status_code == 200, f"Respuesta inesperada: {resp.text}"
+    body = resp.json()
+    assert body["n"] == 2
+    assert all(len(fila) == len(body["features"]) for fila in body["contribuciones"])
+
+    preds = client.post("/model/predict", json={"instances": instances}).json()["predicciones"]
+    for fila, pred in zip(body["contribuciones"], preds):
+        assert abs(body["base"] + sum(fila) - pred) < 1e-6
+
+
+@pytest.fixture
+def raw_y_processed_temporales(tmp_path, monkeypatch):
+    """data/raw y data/processed temporales para que las pruebas no escriban en el repo."""
+    import src.api.preparar_datos as preparar_datos
+
+    raw_dir, proc_dir = tmp_path / "raw", tmp_path / "processed"
+    raw_dir.mkdir()
+    proc_dir.mkdir()
+    monkeypatch.setattr(preparar_datos, "RAW_DIR", raw_dir)
+    monkeypatch.setattr(preparar_datos, "PROC_DIR", proc_dir)
+    return raw_dir, proc_dir
+
+
+def test_prepare_multiple_files_shares_vocabulary(raw_y_processed_temporales):
+    """
+    /data/prepare con varios archivos: un solo CSV consolidado, mismas dummies
+    aunque un archivo no tenga todas las categorías, y resumen por archivo.
+    """
+    raw = Path("data/raw/StudentPerformanceFactors.csv")
+    if not raw.exists():
+        pytest.skip("No se encontró data/raw/StudentPerformanceFactors.csv")
+    raw_dir, proc_dir = raw_y_processed_temporales
+
+    df = pd.read_csv(raw)
+    nombres = ["parte_a.csv", "parte_b.csv"]
+    partes = [df[df["Gender"] == "Male"].head(200), df.iloc[200:600].drop(columns=["Sleep_Hours"])]
+    for nombre, parte in zip(nombres, partes):
+        parte.to_csv(raw_dir / nombre, index=False)
+
+    resp = client.get("/data/prepare", params={"filename": nombres, "output": "consolidado_clean.csv"})
+    assert resp.status_code == 200, f"Respuesta inesperada: {resp.text}"
+    body = resp.json()
+    assert body["filas"] == 600
+    assert Path(body["archivo_salida"]) == proc_dir / "consolidado_clean.csv"
+    assert set(body["dummies_generadas"]) == {"School_Type_Public", "Gender_Male"}
+    assert [a["archivo"] for a in body["archivos"]] == nombres
+    assert body["archivos"][1]["columnas_faltantes"] == ["Sleep_Hours"]
+
+    consolidado = pd.read_csv(body["archivo_salida"])
+    assert consolidado.shape == (600, body["columnas"])
+    assert consolidado.isna().sum().sum() == 0
+    assert not any(proc_dir.glob(".*parte*"))
+
+
+def test_prepare_glob_in_subdirectory(raw_y_processed_temporales):
+    """Un patrón con subcarpeta ('lote/*.csv') resuelve rutas relativas a data/raw."""
+    raw_dir, proc_dir = raw_y_processed_temporales
+    (raw_dir / "lote").mkdir()
+    for i in range(2):
+        pd.DataFrame({"Hours_Studied": [1 + i, 2 + i], "Exam_Score": [60, 70]}).to_csv(
+            raw_dir / "lote" / f"a{i}.csv", index=False
+        )
+
+    resp = client.get("/data/prepare", params={"filename": "lote/*.csv"})
+    assert resp.status_code == 200, f"Respuesta inesperada: {resp.text}"
+    body = resp.json()
+    assert [a["archivo"] for a in body["archivos"]] == ["lote/a0.csv", "lote/a1.csv"]
+    assert body["filas"] == 4
+
+
+def test_prepare_missing_nominal_uses_global_mode(raw_y_processed_temporales):
+    """
+    Un archivo sin una columna nominal toma la moda global en sus dummies (y no,
+    en silencio, la categoría descartada por drop_first); queda en columnas_faltantes.
+    """
+    raw_dir, proc_dir = raw_y_processed_temporales
+    pd.DataFrame({"Gender": ["Female", "Male", "Male", "Male"], "Exam_Score": [60, 65, 70, 75]}).to_csv(
+        raw_dir / "con_genero.csv", index=False
+    )
+    pd.DataFrame({"Exam_Score": [80, 85]}).to_csv(raw_dir / "sin_genero.csv", index=False)
+
+    resp = client.get("/data/prepare", params={"filename": ["con_genero.csv", "sin_genero.csv"]})
+    assert resp.status_code == 200, f"Respuesta inesperada: {resp.text}"
+    body = resp.json()
+    assert body["archivos"][1]["columnas_faltantes"] == ["Gender"]
+
+    consolidado = pd.read_csv(body["archivo_salida"])
+    assert consolidado["Gender_Male"].tolist() == [False, True, True, True, True, True]
+
+
+@pytest.mark.parametrize("filename", ["../raw/a.csv", "/etc/passwd", "../*.csv", "/tmp/*.csv"])
+def test_prepare_rejects_input_outside_raw(raw_y_processed_temporales, filename):
+    """'filename' solo acepta rutas relativas dentro de data/raw: absolutas o con '..' dan 400."""
+    raw_dir, proc_dir = raw_y_processed_temporales
+    resp = client.get("/data/prepare", params={"filename": filename})
+    assert resp.status_code == 400, f"Respuesta inesperada: {resp.text}"
+    assert list(proc_dir.iterdir()) == []
+
+
+@pytest.mark.parametrize("output", ["/tmp/fuera.csv", "../../src/api/x.csv", "sub/x.csv", "x.txt", ".."])
+def test_prepare_rejects_output_outside_processed(raw_y_processed_temporales, output):
+    """'output' solo acepta un nombre simple *.csv: rutas absolutas o con '..' dan 400."""
+    raw_dir, proc_dir = raw_y_processed_temporales
+    pd.DataFrame({"Hours_Studied": [1, 2], "Exam_Score": [60, 70]}).to_csv(raw_dir / "a.csv", index=False)
+
+    resp = client.get("/data/prepare", params={"filename": "a.csv", "output": output})
+    assert resp.status_code == 400, f"Respuesta inesperada: {resp.text}"
+    assert not Path("/tmp/fuera.csv").exists()
+    assert list(proc_dir.iterdir()) == []
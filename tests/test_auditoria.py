@@ -0,0 +1,58 @@
+import time
+
+from src.api.auditoria import RegistroAuditoria, leer_registros
+
+
+def test_registro_escribe_lotes_rotando_y_comprimiendo(tmp_path):
+    """Las entradas encoladas se escriben en JSONL.gz legible y el tamaño fuerza la rotación."""
+    registro = RegistroAuditoria(tmp_path, tam_lote=5, max_bytes=200, intervalo_s=0.05, comprimir=True).iniciar()
+    for i in range(20):
+        assert registro.registrar({"endpoint": "/model/predict", "request": {"instances": [{"i": i}]}})
+    registro.cerrar()
+
+    archivos = sorted(tmp_path.glob("requests-*.jsonl.gz"))
+    assert len(archivos) > 1
+    entradas = [e for a in archivos for e in leer_registros(a)]
+    assert [e["request"]["instances"][0]["i"] for e in entradas] == list(range(20))
+    assert registro.estado()["escritas"] == 20
+
+
+def test_registro_descarta_y_cuenta_con_cola_llena(tmp_path):
+    """Sin hilo escritor la cola se llena: las entradas sobrantes se descartan sin bloquear."""
+    registro = RegistroAuditoria(tmp_path, max_cola=3)
+    resultados = [registro.registrar({"i": i}) for i in range(5)]
+    assert resultados == [True, True, True, False, False]
+    estado = registro.estado()
+    assert estado["encoladas"] == 3 and estado["descartadas"] == 2
+
+
+def test_registro_sobrevive_errores_de_escritura(tmp_path):
+    """
+    Un lote que no se puede escribir (directorio inexistente) o una entrada no
+    serializable se cuentan en 'errores'; el hilo sigue vivo y reabre el archivo.
+    """
+    registro = RegistroAuditoria(tmp_path, intervalo_s=0.05).iniciar()
+    registro.directorio = tmp_path / "no_existe"
+    registro.registrar({"i": 0})
+    _esperar(lambda: registro.estado()["errores"] == 1)
+
+    registro.directorio = tmp_path
+    circular = {}
+    circular["yo"] = circular
+    registro.registrar(circular)
+    registro.registrar({"i": 1})
+    _esperar(lambda: registro.estado()["escritas"] == 1)
+
+    estado = registro.estado()
+    assert estado["writer_vivo"] and estado["errores"] == 2
+    assert estado["ultimo_error"].startswith("ValueError")
+    registro.cerrar()
+    assert not registro.estado()["writer_vivo"]
+    assert [e["i"] for a in tmp_path.glob("requests-*.jsonl") for e in leer_registros(a)] == [1]
+
+
+def _esperar(condicion, timeout: float = 5.0):
+    limite = time.time() + timeout
+    while not condicion():
+        assert time.time() < limite, "Tiempo de espera agotado"
+        time.sleep(0.01)
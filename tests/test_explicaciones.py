@@ -0,0 +1,48 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.linear_model import Ridge
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+from sklearn.tree import DecisionTreeRegressor
+
+from src.api.explicaciones import construir_explicador, explicar
+
+
+@pytest.fixture(scope="module")
+def datos():
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame(rng.normal(size=(400, 5)), columns=list("abcde"))
+    y = 3 * X["a"] - 2 * X["b"] ** 2 + np.sin(X["c"]) + rng.normal(0, 0.1, len(X))
+    return X, y
+
+
+@pytest.mark.parametrize(
+    "modelo",
+    [
+        RandomForestRegressor(n_estimators=20, random_state=0),
+        DecisionTreeRegressor(max_depth=6, random_state=0),
+        Pipeline([("scaler", StandardScaler()), ("model", Ridge(alpha=1.0))]),
+    ],
+    ids=["random_forest", "arbol", "ridge"],
+)
+def test_base_mas_contribuciones_es_la_prediccion(datos, modelo):
+    """Para cada tipo de modelo soportado, base + suma de contribuciones = predict."""
+    X, y = datos
+    modelo.fit(X, y)
+    explicador = construir_explicador(modelo, X.shape[1], X)
+    assert explicador is not None
+
+    base, contribuciones = explicar(modelo, explicador, X.head(50))
+    assert contribuciones.shape == (50, X.shape[1])
+    np.testing.assert_allclose(base + contribuciones.sum(axis=1), modelo.predict(X.head(50)), atol=1e-9)
+
+
+def test_arboles_sin_contribucion_de_features_no_usadas(datos):
+    """En el camino por árboles una feature que nunca se usa en un split no aporta nada."""
+    X, y = datos
+    X = X.assign(constante=0.0)
+    rf = RandomForestRegressor(n_estimators=10, random_state=0).fit(X, y)
+    _, contribuciones = explicar(rf, construir_explicador(rf, X.shape[1]), X.head(20))
+    assert np.all(contribuciones[:, -1] == 0)
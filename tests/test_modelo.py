@@ -0,0 +1,101 @@
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.api import modelo
+
+
+@pytest.fixture
+def dataset_no_lineal(tmp_path, monkeypatch):
+    """CSV limpio sintético con objetivo no lineal (Ridge pierde) en un data/processed temporal."""
+    monkeypatch.setattr(modelo, "PROC_DIR", tmp_path)
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame(rng.uniform(-1, 1, size=(1200, 4)), columns=["a", "b", "c", "d"])
+    y = 10 * np.sign(X["a"] * X["b"]) + 5 * (X["c"] > 0.3) + rng.normal(0, 0.5, len(X))
+    X.assign(Exam_Score=y).to_csv(tmp_path / "sintetico_clean.csv", index=False)
+    return "sintetico_clean.csv"
+
+
+def test_presupuesto_de_tamano_elige_variante_compacta(dataset_no_lineal, tmp_path):
+    """
+    Con un límite de tamaño que excluye el bosque completo, se elige la variante
+    compacta más precisa que cumple, aunque Ridge también cumpla.
+    """
+    resultado = modelo.entrenar_y_guardar(
+        dataset_no_lineal, model_path=tmp_path / "model.pkl", tamano_max_mb=1, compactar=True
+    )
+    metrics = resultado["metrics"]
+    tabla = {c["modelo"]: c for c in metrics["candidatos"]}
+    elegido = tabla[metrics["mejor"]["modelo"]]
+
+    assert not tabla["RandomForest"]["cumple"]
+    assert elegido["modelo"] not in {"Ridge", "RandomForest"}
+    assert elegido["cumple"] and elegido["tamano_mb"] <= 1
+    assert elegido["RMSE"] < tabla["Ridge"]["RMSE"]
+    assert all(c["RMSE"] >= elegido["RMSE"] for c in tabla.values() if c["cumple"])
+    assert all({"p99_ms", "tamano_mb"} <= set(c) for c in tabla.values())
+
+
+def test_explicador_en_archivo_aparte(dataset_no_lineal, tmp_path):
+    """
+    El explicador se guarda fuera de model.pkl (que carga cada /model/predict) y
+    explicar_instancias reproduce las predicciones del bosque elegido.
+    """
+    model_path = tmp_path / "model.pkl"
+    modelo.entrenar_y_guardar(dataset_no_lineal, model_path=model_path)
+    bundle = joblib.load(model_path)
+    assert "explicador" not in bundle
+    assert (tmp_path / "model_explicador.pkl").exists()
+
+    instancias = pd.read_csv(tmp_path / dataset_no_lineal).drop(columns=["Exam_Score"]).head(30).to_dict("records")
+    explicacion = modelo.explicar_instancias(instancias, model_path=model_path)
+    assert explicacion["metodo"] == "ruta_arboles"
+    preds = modelo.predecir(instancias, model_path=model_path)["predicciones"]
+    np.testing.assert_allclose(explicacion["predicciones"], preds, atol=1e-9)
+
+
+@pytest.mark.parametrize("n_filas", [1256, 2510])
+def test_curva_con_pocas_filas_fuera_de_la_muestra(n_filas):
+    """
+    Tamaños de train donde la submuestra dejaría fuera menos filas que estratos
+    (1004 y 2008 filas tras separar validación): se usa el conjunto completo.
+    """
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame(rng.normal(size=(n_filas, 3)), columns=["a", "b", "c"])
+    y = 3 * X["a"] + rng.normal(0, 0.1, n_filas)
+    *_, muestreo = modelo._entrenar_con_presupuesto(X, y, presupuesto_s=600, random_state=0, tolerancia=-1)
+    assert muestreo["motivo_parada"] == "datos_completos"
+    assert muestreo["tamano_muestra"] == muestreo["tamano_total"] == n_filas - muestreo["tamano_validacion"]
+
+
+def test_presupuesto_de_tiempo_valida_fuera_de_test_y_omite_compactacion(dataset_no_lineal, tmp_path):
+    """
+    La validación de la curva sale de train (no del conjunto de prueba) y, con el
+    presupuesto agotado, la compactación se omite y se informa el tiempo total.
+    """
+    resultado = modelo.entrenar_y_guardar(
+        dataset_no_lineal, model_path=tmp_path / "model.pkl", presupuesto_s=0.001, compactar=True
+    )
+    metrics = resultado["metrics"]
+    muestreo = metrics["muestreo"]
+    n_train = int(len(pd.read_csv(tmp_path / dataset_no_lineal)) * 0.8)
+    assert muestreo["tamano_total"] + muestreo["tamano_validacion"] == n_train
+    assert muestreo["curva"][-1]["n"] == muestreo["tamano_muestra"]
+    assert muestreo["compactacion_omitida"]
+    assert muestreo["tiempo_total_s"] >= muestreo["tiempo_s"]
+    assert {c["modelo"] for c in metrics["candidatos"]} == {"Ridge", "RandomForest"}
+
+
+def test_destilado_aprende_de_predicciones_oob():
+    """El árbol destilado se ajusta a las predicciones out-of-bag del bosque, no a y_train."""
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame(rng.normal(size=(400, 3)), columns=["a", "b", "c"])
+    y = pd.Series(np.sin(3 * X["a"]) + X["b"] ** 2 + rng.normal(0, 0.3, len(X)))
+    rf = modelo.RandomForestRegressor(n_estimators=40, oob_score=True, random_state=0).fit(X, y)
+
+    destilado = modelo._compactar_bosque(rf, X, y, random_state=0)["Destilado_arbol_prof_8"]
+    esperado = modelo.DecisionTreeRegressor(max_depth=8, random_state=0).fit(X, rf.oob_prediction_)
+    np.testing.assert_allclose(destilado.predict(X), esperado.predict(X))
+    sobre_etiquetas = modelo.DecisionTreeRegressor(max_depth=8, random_state=0).fit(X, y)
+    assert not np.allclose(destilado.predict(X), sobre_etiquetas.predict(X))
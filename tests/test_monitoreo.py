@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+
+from src.api.monitoreo import UMBRAL_PSI, MonitorDeriva, construir_referencia, obtener_monitor
+
+
+def _referencia(semilla: int = 0):
+    rng = np.random.default_rng(semilla)
+    X = rng.normal(size=(2000, 3))
+    return X, construir_referencia(X, X[:, 0] + X[:, 1])
+
+
+def test_psi_detecta_feature_desplazada():
+    """Un lote con la feature 1 desplazada supera el umbral de PSI solo en esa feature."""
+    X, referencia = _referencia()
+    monitor = MonitorDeriva(referencia, "v1")
+    lote = np.random.default_rng(1).normal(size=(500, 3))
+    lote[:, 1] += 3
+    # Mezcla de filas sueltas (camino de /model/predict) y un lote
+    for fila in lote[:50]:
+        monitor.registrar(fila.reshape(1, -1), [fila[0] + fila[1]])
+    monitor.registrar(lote[50:], lote[50:, 0] + lote[50:, 1])
+
+    reporte = monitor.reporte(["a", "b", "c"])
+    assert reporte["n_filas"] == 500
+    assert reporte["features"]["b"]["psi"] > UMBRAL_PSI
+    assert reporte["features"]["a"]["psi"] < UMBRAL_PSI
+    assert reporte["features_con_deriva"] == ["b"]
+    assert reporte["prediccion"]["psi"] > UMBRAL_PSI
+
+
+def test_monitor_se_reinicia_al_cambiar_version():
+    """El monitor global acumula mientras la versión no cambia y se reinicia con un modelo nuevo."""
+    X, referencia = _referencia()
+    monitor = obtener_monitor({"referencia": referencia, "version": "v1"})
+    monitor.registrar(X[:10], X[:10, 0])
+    assert obtener_monitor({"referencia": referencia, "version": "v1"}) is monitor
+
+    nuevo = obtener_monitor({"referencia": referencia, "version": "v2"})
+    assert nuevo is not monitor and nuevo.version == "v2" and nuevo.n == 0
+    assert obtener_monitor({"version": "v3"}) is None
+
+
+def test_fusionar_equivale_a_un_solo_monitor():
+    """Fusionar dos monitores da los mismos conteos y reporte que uno alimentado con ambos flujos."""
+    X, referencia = _referencia()
+    rng = np.random.default_rng(2)
+    flujo_a, flujo_b = rng.normal(size=(300, 3)), rng.normal(1, 1, size=(200, 3))
+
+    a, b, unico = (MonitorDeriva(referencia, "v1") for _ in range(3))
+    a.registrar(flujo_a, flujo_a[:, 0])
+    for fila in flujo_b[:20]:
+        b.registrar(fila.reshape(1, -1), fila[:1])
+    b.registrar(flujo_b[20:], flujo_b[20:, 0])
+    unico.registrar(np.vstack([flujo_a, flujo_b]), np.concatenate([flujo_a[:, 0], flujo_b[:, 0]]))
+
+    a.fusionar(b)
+    assert a.n == unico.n == 500
+    np.testing.assert_array_equal(a.conteos, unico.conteos)
+    np.testing.assert_array_equal(a.conteos_pred, unico.conteos_pred)
+    assert a.reporte(["a", "b", "c"]) == unico.reporte(["a", "b", "c"])
+
+
+def test_fusionar_rechaza_otra_version_o_cortes():
+    """No se fusionan monitores de versiones o referencias distintas."""
+    _, referencia = _referencia()
+    _, otra_referencia = _referencia(semilla=1)
+    monitor = MonitorDeriva(referencia, "v1")
+    with pytest.raises(ValueError):
+        monitor.fusionar(MonitorDeriva(referencia, "v2"))
+    with pytest.raises(ValueError):
+        monitor.fusionar(MonitorDeriva(otra_referencia, "v1"))